@@ -1,22 +1,28 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, update, func, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 import os
 import uuid
-import aiofiles
-from typing import Dict, Any
+import asyncio
+import hashlib
+import aiofiles.os as aos
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Tuple
 import logging
 
 from app.models.schemas import (
     FileUploadResponse, EvaluationRequest, TaskResponse, 
-    TaskResultResponse, TaskStatus
+    TaskResultResponse, TaskStatus, EvaluationResult
 )
-from app.models.database import EvaluationTask
+from app.models.database import EvaluationTask, EvaluationTaskResult
 from app.services.database import get_db
 from app.services.evaluation_pipeline import get_evaluation_pipeline
+from app.services.gemini_service import is_fallback_result
 from app.services.pdf_service import PDFReportService
-from app.utils.document_processor import DocumentProcessor
+from app.utils.document_processor import DocumentProcessor, FILE_SIGNATURE_LENGTH
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -24,16 +30,155 @@ router = APIRouter()
 # Configuration
 UPLOAD_DIR = "uploads"
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+FILE_WRITE_CHUNK_SIZE = 1024 * 1024  # 1MB
+# Upload requests carry two files plus form fields and multipart boundaries
+MAX_REQUEST_SIZE = 2 * MAX_FILE_SIZE + 64 * 1024
+# Processing tasks not updated for this long (well past the worker's 10 minute
+# job timeout) are treated as abandoned, e.g. after a crash or restart. Queued
+# tasks are never expired: they may just be waiting behind a queue backlog.
+INFLIGHT_TASK_TIMEOUT = timedelta(seconds=int(os.getenv("INFLIGHT_TASK_TIMEOUT", "1200")))
 
-async def save_upload_file(upload_file: UploadFile, destination: str) -> str:
-    """Save uploaded file to destination"""
-    os.makedirs(os.path.dirname(destination), exist_ok=True)
+def _write_upload_sync(source, destination: str, file_label: str) -> str:
+    """Copy an upload stream to disk, hashing and size-checking each chunk
     
-    async with aiofiles.open(destination, 'wb') as f:
-        content = await upload_file.read()
-        await f.write(content)
+    Runs entirely in one worker thread (like shutil.copyfileobj) instead of
+    hopping to a thread for every chunk.
+    """
+    digest = hashlib.sha256()
+    total = 0
+    source.seek(0)
+    with open(destination, 'wb') as out:
+        while chunk := source.read(FILE_WRITE_CHUNK_SIZE):
+            total += len(chunk)
+            if total > MAX_FILE_SIZE:
+                raise HTTPException(status_code=400, detail=f"{file_label} too large (max 10MB)")
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+async def save_upload_file(upload_file: UploadFile, destination: str, file_label: str = "File") -> Tuple[str, str]:
+    """Stream uploaded file to destination in chunks, enforcing MAX_FILE_SIZE
+    
+    Returns the saved path and the SHA-256 hex digest of the file content.
+    """
+    await aos.makedirs(os.path.dirname(destination), exist_ok=True)
+    
+    try:
+        content_hash = await asyncio.to_thread(_write_upload_sync, upload_file.file, destination, file_label)
+    except HTTPException:
+        # Don't leave a partially written file behind
+        if await aos.path.exists(destination):
+            await aos.remove(destination)
+        raise
+    
+    return destination, content_hash
+
+def validate_upload_size(upload_file: UploadFile, file_label: str) -> None:
+    """Reject uploads whose reported size exceeds MAX_FILE_SIZE, before anything is saved"""
+    if upload_file.size is not None and upload_file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail=f"{file_label} too large (max 10MB)")
+
+async def save_upload_pair(cv_file: UploadFile, cv_path: str,
+                           project_report: UploadFile, project_path: str) -> Tuple[str, str, str, str]:
+    """Save the CV and project report, leaving neither behind if either fails
+    
+    Returns the saved CV path and hash, then the saved project report path and hash.
+    """
+    validate_upload_size(cv_file, "CV file")
+    validate_upload_size(project_report, "Project report file")
+    
+    cv_saved_path, cv_hash = await save_upload_file(cv_file, cv_path, "CV file")
+    try:
+        project_saved_path, project_hash = await save_upload_file(
+            project_report, project_path, "Project report file"
+        )
+    except BaseException:
+        await remove_files(cv_saved_path)
+        raise
+    return cv_saved_path, cv_hash, project_saved_path, project_hash
+
+async def validate_upload_signature(upload_file: UploadFile, file_label: str) -> None:
+    """Reject uploads whose leading bytes don't match their extension, before saving"""
+    header = await upload_file.read(FILE_SIGNATURE_LENGTH)
+    await upload_file.seek(0)
+    if not DocumentProcessor.validate_file_signature(upload_file.filename, header):
+        raise HTTPException(
+            status_code=415,
+            detail=f"{file_label} content does not match its file extension"
+        )
+
+def compute_content_hash(cv_hash: str, project_hash: str, job_description: str) -> str:
+    """Hash identifying an evaluation by its inputs (CV, project report, job description)"""
+    return hashlib.sha256(f"{cv_hash}:{project_hash}:{job_description}".encode()).hexdigest()
+
+async def find_completed_duplicate(db: AsyncSession, content_hash: str) -> Optional[EvaluationTask]:
+    """Find a completed task that evaluated exactly the same inputs"""
+    result = await db.execute(
+        select(EvaluationTask)
+        .options(selectinload(EvaluationTask.result_record))
+        .where(EvaluationTask.content_hash == content_hash)
+        .where(EvaluationTask.status == TaskStatus.COMPLETED)
+        .order_by(EvaluationTask.created_at.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def find_inflight_duplicate(db: AsyncSession, content_hash: str) -> Optional[EvaluationTask]:
+    """Find a queued or live processing task for exactly the same inputs"""
+    result = await db.execute(
+        select(EvaluationTask)
+        .where(EvaluationTask.content_hash == content_hash)
+        .where(or_(
+            EvaluationTask.status == TaskStatus.QUEUED,
+            and_(
+                EvaluationTask.status == TaskStatus.PROCESSING,
+                EvaluationTask.updated_at >= datetime.now(timezone.utc) - INFLIGHT_TASK_TIMEOUT
+            )
+        ))
+    )
+    return result.scalars().first()
+
+async def expire_stale_inflight(db: AsyncSession, content_hash: str) -> None:
+    """Mark abandoned processing tasks for these inputs as failed
     
-    return destination
+    Frees the in-flight slot held by uq_tasks_inflight_content so that a new
+    task for the same inputs can be created.
+    """
+    await db.execute(
+        update(EvaluationTask)
+        .where(EvaluationTask.content_hash == content_hash)
+        .where(EvaluationTask.status == TaskStatus.PROCESSING)
+        .where(EvaluationTask.updated_at < datetime.now(timezone.utc) - INFLIGHT_TASK_TIMEOUT)
+        .values(status=TaskStatus.FAILED, error_message="Evaluation stalled and was abandoned")
+    )
+
+async def link_duplicate_file(existing_path: str, new_path: str) -> None:
+    """Replace a freshly saved duplicate upload with a hard link to the existing copy"""
+    if not await aos.path.exists(existing_path):
+        return
+    temp_path = f"{new_path}.link"
+    try:
+        await aos.link(existing_path, temp_path)
+        await aos.replace(temp_path, new_path)
+    except OSError as e:
+        # Hard links are not supported everywhere; keep the written copy
+        logger.debug(f"Could not hard-link {new_path} to {existing_path}: {e}")
+
+async def remove_files(*paths: str) -> None:
+    """Remove files that exist, ignoring missing ones"""
+    for path in paths:
+        if path and await aos.path.exists(path):
+            await aos.remove(path)
+
+async def schedule_evaluation(request: Request, background_tasks: BackgroundTasks, task_id: str) -> None:
+    """Enqueue evaluation on the ARQ worker queue, falling back to in-process background tasks"""
+    arq_pool = getattr(request.app.state, "arq", None)
+    if arq_pool is not None:
+        # _job_id dedupes repeated enqueues of the same task
+        await arq_pool.enqueue_job("run_evaluation_task", task_id, _job_id=task_id)
+    else:
+        pipeline = get_evaluation_pipeline()
+        background_tasks.add_task(pipeline.run_evaluation, task_id)
 
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_files(
@@ -60,30 +205,22 @@ async def upload_files(
                 detail=f"Invalid project report file format. Supported: PDF, DOCX, TXT"
             )
         
-        # Check file sizes
-        cv_content = await cv_file.read()
-        project_content = await project_report.read()
-        
-        if len(cv_content) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="CV file too large (max 10MB)")
-        if len(project_content) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="Project report file too large (max 10MB)")
-        
-        # Reset file positions
-        await cv_file.seek(0)
-        await project_report.seek(0)
+        # Check file contents match the claimed formats
+        await validate_upload_signature(cv_file, "CV file")
+        await validate_upload_signature(project_report, "Project report file")
         
         # Generate unique filenames
         session_id = str(uuid.uuid4())
         cv_filename = f"{session_id}_cv_{cv_file.filename}"
         project_filename = f"{session_id}_project_{project_report.filename}"
         
-        # Save files
+        # Save files (size is enforced while streaming)
         cv_path = os.path.join(UPLOAD_DIR, cv_filename)
         project_path = os.path.join(UPLOAD_DIR, project_filename)
         
-        cv_saved_path = await save_upload_file(cv_file, cv_path)
-        project_saved_path = await save_upload_file(project_report, project_path)
+        cv_saved_path, _, project_saved_path, _ = await save_upload_pair(
+            cv_file, cv_path, project_report, project_path
+        )
         
         logger.info(f"Files uploaded successfully: CV={cv_saved_path}, Project={project_saved_path}")
         
@@ -107,6 +244,7 @@ async def upload_files(
 
 @router.post("/evaluate-direct", response_model=TaskResponse)
 async def evaluate_files_direct(
+    request: Request,
     cv_file: UploadFile = File(..., description="CV file (PDF, DOCX, or TXT)"),
     project_report: UploadFile = File(..., description="Project report file (PDF, DOCX, or TXT)"),
     job_description: str = Form(default="Backend Developer position", description="Job description for evaluation"),
@@ -134,48 +272,80 @@ async def evaluate_files_direct(
                 detail=f"Invalid project report file format. Supported: PDF, DOCX, TXT"
             )
         
-        # Check file sizes
-        cv_content = await cv_file.read()
-        project_content = await project_report.read()
-        
-        if len(cv_content) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="CV file too large (max 10MB)")
-        if len(project_content) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="Project report file too large (max 10MB)")
-        
-        # Reset file positions
-        await cv_file.seek(0)
-        await project_report.seek(0)
+        # Check file contents match the claimed formats
+        await validate_upload_signature(cv_file, "CV file")
+        await validate_upload_signature(project_report, "Project report file")
         
         # Generate unique filenames
         session_id = str(uuid.uuid4())
         cv_filename = f"{session_id}_cv_{cv_file.filename}"
         project_filename = f"{session_id}_project_{project_report.filename}"
         
-        # Save files
+        # Save files (size is enforced while streaming)
         cv_path = os.path.join(UPLOAD_DIR, cv_filename)
         project_path = os.path.join(UPLOAD_DIR, project_filename)
         
-        cv_saved_path = await save_upload_file(cv_file, cv_path)
-        project_saved_path = await save_upload_file(project_report, project_path)
+        cv_saved_path, cv_hash, project_saved_path, project_hash = await save_upload_pair(
+            cv_file, cv_path, project_report, project_path
+        )
         
         logger.info(f"Files uploaded successfully: CV={cv_saved_path}, Project={project_saved_path}")
         
+        # Reuse the result of an identical, already completed evaluation
+        content_hash = compute_content_hash(cv_hash, project_hash, job_description)
+        duplicate = await find_completed_duplicate(db, content_hash)
+        # Results recorded before placeholders were excluded may still be fallbacks
+        if (duplicate and duplicate.result
+                and not is_fallback_result(EvaluationResult.model_validate(duplicate.result))):
+            await link_duplicate_file(duplicate.cv_file_path, cv_saved_path)
+            await link_duplicate_file(duplicate.project_report_path, project_saved_path)
+            
+            task = EvaluationTask(
+                cv_file_path=cv_saved_path,
+                project_report_path=project_saved_path,
+                job_description=job_description,
+                cv_hash=cv_hash,
+                project_hash=project_hash,
+                content_hash=content_hash,
+                status=TaskStatus.COMPLETED
+            )
+            db.add(task)
+            await db.flush()
+            db.add(EvaluationTaskResult(task_id=task.id, payload=duplicate.result))
+            await db.commit()
+            
+            logger.info(f"Reused result of task {duplicate.id} for duplicate upload: {task.id}")
+            
+            return TaskResponse(id=task.id, status=TaskStatus.COMPLETED)
+        
         # Create evaluation task immediately
         task = EvaluationTask(
             cv_file_path=cv_saved_path,
             project_report_path=project_saved_path,
             job_description=job_description,
+            cv_hash=cv_hash,
+            project_hash=project_hash,
+            content_hash=content_hash,
             status=TaskStatus.QUEUED
         )
         
+        await expire_stale_inflight(db, content_hash)
         db.add(task)
-        await db.commit()
+        try:
+            await db.commit()
+        except IntegrityError:
+            # An identical evaluation is already queued or processing
+            await db.rollback()
+            inflight = await find_inflight_duplicate(db, content_hash)
+            if not inflight:
+                raise
+            await remove_files(cv_saved_path, project_saved_path)
+            logger.info(f"Duplicate upload joined in-flight task: {inflight.id}")
+            return TaskResponse(id=inflight.id, status=inflight.status)
         await db.refresh(task)
         
         # Start background evaluation immediately
-        pipeline = await get_evaluation_pipeline()
-        background_tasks.add_task(pipeline.run_evaluation, task.id)
+        await schedule_evaluation(request, background_tasks, task.id)
         
         logger.info(f"Files uploaded and evaluation started: {task.id}")
         
@@ -189,6 +359,7 @@ async def evaluate_files_direct(
 
 @router.post("/evaluate", response_model=TaskResponse)
 async def create_evaluation_task(
+    request: Request,
     cv_file_path: str = Form(..., description="Path to the uploaded CV file"),
     project_report_path: str = Form(..., description="Path to the uploaded project report file"),
     job_description: str = Form(default="Backend Developer position", description="Job description for evaluation"),
@@ -200,9 +371,9 @@ async def create_evaluation_task(
     """
     try:
         # Validate file paths exist
-        if not os.path.exists(cv_file_path):
+        if not await aos.path.exists(cv_file_path):
             raise HTTPException(status_code=404, detail="CV file not found")
-        if not os.path.exists(project_report_path):
+        if not await aos.path.exists(project_report_path):
             raise HTTPException(status_code=404, detail="Project report file not found")
         
         # Create evaluation task
@@ -218,8 +389,7 @@ async def create_evaluation_task(
         await db.refresh(task)
         
         # Start background evaluation
-        pipeline = await get_evaluation_pipeline()
-        background_tasks.add_task(pipeline.run_evaluation, task.id)
+        await schedule_evaluation(request, background_tasks, task.id)
         
         logger.info(f"Evaluation task created: {task.id}")
         
@@ -242,9 +412,11 @@ async def get_evaluation_result(
     - **task_id**: The ID of the evaluation task
     """
     try:
-        # Get task from database
+        # Get task from database, including its result payload
         result = await db.execute(
-            select(EvaluationTask).where(EvaluationTask.id == task_id)
+            select(EvaluationTask)
+            .options(selectinload(EvaluationTask.result_record))
+            .where(EvaluationTask.id == task_id)
         )
         task = result.scalar_one_or_none()
         
@@ -264,7 +436,7 @@ async def get_evaluation_result(
         elif task.status == TaskStatus.FAILED and task.error_message:
             response_data["error"] = task.error_message
         
-        return TaskResultResponse(**response_data)
+        return TaskResultResponse.model_validate(response_data)
         
     except HTTPException:
         raise
@@ -281,37 +453,56 @@ async def list_tasks(
 ):
     """List all evaluation tasks with pagination and optional results"""
     try:
+        # Only load the large result/error columns when they are requested
+        columns = [
+            EvaluationTask.id,
+            EvaluationTask.status,
+            EvaluationTask.created_at,
+            EvaluationTask.updated_at,
+            EvaluationTask.cv_file_path,
+            EvaluationTask.project_report_path,
+            EvaluationTask.job_description
+        ]
+        query = select(*columns)
+        if include_results:
+            query = query.add_columns(
+                EvaluationTaskResult.payload.label("result"), EvaluationTask.error_message
+            ).outerjoin(EvaluationTaskResult, EvaluationTaskResult.task_id == EvaluationTask.id)
+        
         result = await db.execute(
-            select(EvaluationTask)
+            query
+            .order_by(EvaluationTask.created_at.desc())
             .offset(offset)
             .limit(limit)
-            .order_by(EvaluationTask.created_at.desc())
         )
-        tasks = result.scalars().all()
+        rows = result.all()
+        
+        # Total count across all tasks, not just the current page
+        total = await db.scalar(select(func.count()).select_from(EvaluationTask))
         
         task_list = []
-        for task in tasks:
+        for row in rows:
             task_data = {
-                "id": task.id,
-                "status": task.status,
-                "created_at": task.created_at,
-                "updated_at": task.updated_at,
-                "cv_file": task.cv_file_path.split('/')[-1] if task.cv_file_path else None,
-                "project_file": task.project_report_path.split('/')[-1] if task.project_report_path else None,
-                "job_description": task.job_description
+                "id": row.id,
+                "status": row.status,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+                "cv_file": row.cv_file_path.split('/')[-1] if row.cv_file_path else None,
+                "project_file": row.project_report_path.split('/')[-1] if row.project_report_path else None,
+                "job_description": row.job_description
             }
             
             # Include results if requested and available
-            if include_results and task.status == TaskStatus.COMPLETED and task.result:
-                task_data["result"] = task.result
-            elif include_results and task.status == TaskStatus.FAILED and task.error_message:
-                task_data["error"] = task.error_message
+            if include_results and row.status == TaskStatus.COMPLETED and row.result:
+                task_data["result"] = row.result
+            elif include_results and row.status == TaskStatus.FAILED and row.error_message:
+                task_data["error"] = row.error_message
                 
             task_list.append(task_data)
         
         return {
             "tasks": task_list,
-            "total": len(tasks)
+            "total": total
         }
         
     except Exception as e:
@@ -325,28 +516,29 @@ async def delete_task(
 ):
     """Delete an evaluation task and its associated files"""
     try:
-        # Get task from database
+        # Delete task and its result in one transaction, returning the file paths
+        await db.execute(
+            delete(EvaluationTaskResult).where(EvaluationTaskResult.task_id == task_id)
+        )
         result = await db.execute(
-            select(EvaluationTask).where(EvaluationTask.id == task_id)
+            delete(EvaluationTask)
+            .where(EvaluationTask.id == task_id)
+            .returning(EvaluationTask.cv_file_path, EvaluationTask.project_report_path)
         )
-        task = result.scalar_one_or_none()
+        row = result.first()
         
-        if not task:
+        if not row:
+            await db.rollback()
             raise HTTPException(status_code=404, detail="Task not found")
         
-        # Delete associated files
+        await db.commit()
+        
+        # Delete associated files without blocking the event loop
         try:
-            if os.path.exists(task.cv_file_path):
-                os.remove(task.cv_file_path)
-            if os.path.exists(task.project_report_path):
-                os.remove(task.project_report_path)
+            await remove_files(row.cv_file_path, row.project_report_path)
         except Exception as e:
             logger.warning(f"Failed to delete files for task {task_id}: {e}")
         
-        # Delete task from database
-        await db.delete(task)
-        await db.commit()
-        
         return {"message": f"Task {task_id} deleted successfully"}
         
     except HTTPException:
@@ -371,9 +563,11 @@ async def export_task_pdf(
         PDF file as streaming response
     """
     try:
-        # Get task from database
+        # Get task from database, including its result payload
         result = await db.execute(
-            select(EvaluationTask).where(EvaluationTask.id == task_id)
+            select(EvaluationTask)
+            .options(selectinload(EvaluationTask.result_record))
+            .where(EvaluationTask.id == task_id)
         )
         task = result.scalar_one_or_none()
         
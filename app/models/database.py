@@ -1,23 +1,49 @@
-from sqlalchemy import Column, String, DateTime, Text, Float, JSON
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Enum, String, DateTime, Text, JSON, Index, ForeignKey
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from datetime import datetime
+from typing import Any, Dict, Optional
 import uuid
 
-Base = declarative_base()
+from app.models.schemas import TaskStatus
+
+class Base(DeclarativeBase):
+    pass
 
 class EvaluationTask(Base):
     __tablename__ = "evaluation_tasks"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    status = Column(String, default="queued")
-    cv_file_path = Column(String, nullable=False)
-    project_report_path = Column(String, nullable=False)
-    job_description = Column(Text)
-    result = Column(JSON, nullable=True)
-    error_message = Column(Text, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Stored as the enum value ("queued", ...) so existing rows remain valid
+    status: Mapped[TaskStatus] = mapped_column(
+        Enum(
+            TaskStatus,
+            native_enum=False,
+            length=16,
+            values_callable=lambda statuses: [status.value for status in statuses]
+        ),
+        default=TaskStatus.QUEUED
+    )
+    cv_file_path: Mapped[str] = mapped_column(String, nullable=False)
+    project_report_path: Mapped[str] = mapped_column(String, nullable=False)
+    job_description: Mapped[Optional[str]] = mapped_column(Text)
+    # SHA-256 of each uploaded file, and over CV, project report and job
+    # description together, used to reuse results and dedupe in-flight work
+    cv_hash: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    project_hash: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    content_hash: Mapped[Optional[str]] = mapped_column(String, nullable=True, index=True)
+    error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Result payload lives in its own table and is only loaded on request
+    # (e.g. options(selectinload(EvaluationTask.result_record)))
+    result_record: Mapped[Optional["EvaluationTaskResult"]] = relationship(lazy="noload")
+    
+    @property
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Evaluation result payload, if it was loaded with the task"""
+        return self.result_record.payload if self.result_record else None
     
     def to_dict(self):
         return {
@@ -30,4 +56,24 @@ class EvaluationTask(Base):
             "error_message": self.error_message,
             "created_at": self.created_at,
             "updated_at": self.updated_at
-        }
\ No newline at end of file
+        }
+
+# Ordered pagination in list_tasks, and status filtering
+Index("ix_tasks_created_at", EvaluationTask.created_at.desc())
+Index("ix_tasks_status_created", EvaluationTask.status, EvaluationTask.created_at.desc())
+
+# At most one queued/processing task per set of inputs
+INFLIGHT_STATUSES = (TaskStatus.QUEUED, TaskStatus.PROCESSING)
+Index(
+    "uq_tasks_inflight_content",
+    EvaluationTask.content_hash,
+    unique=True,
+    sqlite_where=EvaluationTask.status.in_(INFLIGHT_STATUSES),
+    postgresql_where=EvaluationTask.status.in_(INFLIGHT_STATUSES)
+)
+
+class EvaluationTaskResult(Base):
+    __tablename__ = "evaluation_task_results"
+    
+    task_id: Mapped[str] = mapped_column(String, ForeignKey("evaluation_tasks.id", ondelete="CASCADE"), primary_key=True)
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from enum import Enum
@@ -24,6 +24,8 @@ class TaskResponse(BaseModel):
     status: TaskStatus
 
 class CVEvaluation(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     technical_skills_match: float = Field(ge=1, le=5)
     experience_level: float = Field(ge=1, le=5)
     relevant_achievements: float = Field(ge=1, le=5)
@@ -31,6 +33,8 @@ class CVEvaluation(BaseModel):
     overall_score: float = Field(ge=1, le=5)
 
 class ProjectEvaluation(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     correctness: float = Field(ge=1, le=5)
     code_quality: float = Field(ge=1, le=5)
     resilience: float = Field(ge=1, le=5)
@@ -39,6 +43,8 @@ class ProjectEvaluation(BaseModel):
     overall_score: float = Field(ge=1, le=5)
 
 class EvaluationResult(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     cv_match_rate: float = Field(ge=0, le=1)
     cv_feedback: str
     project_score: float = Field(ge=1, le=10)
@@ -57,9 +63,28 @@ class TaskResultResponse(BaseModel):
 
 class ExtractedCVData(BaseModel):
     """Structured data extracted from CV"""
+    model_config = ConfigDict(frozen=True)
+    
     skills: List[str]
     experiences: List[str]
     projects: List[str]
     education: List[str]
     years_of_experience: Optional[int] = None
-    achievements: List[str]
\ No newline at end of file
+    achievements: List[str]
+
+class CVMatchResponse(BaseModel):
+    """Gemini response for the CV match evaluation"""
+    match_rate: float = Field(ge=0, le=1)
+    feedback: str
+    detailed_scores: CVEvaluation
+
+class CVExtractAndMatchResponse(BaseModel):
+    """Gemini response for the fused CV extraction and match evaluation"""
+    extracted: ExtractedCVData
+    evaluation: CVMatchResponse
+
+class ProjectEvaluationResponse(BaseModel):
+    """Gemini response for the project report evaluation"""
+    score: float = Field(ge=1, le=10)
+    feedback: str
+    detailed_scores: ProjectEvaluation
@@ -1,24 +1,99 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool
 from app.models.database import Base
 import os
+import logging
 from typing import AsyncGenerator
 
+logger = logging.getLogger(__name__)
+
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./evaluation.db")
 
+# SQL statement logging for debugging. Goes through the root (queued) logging
+# handlers instead of echo=True, which attaches its own blocking stderr handler
+DEBUG_SQL = os.getenv("DEBUG_SQL", "false").lower() in ("1", "true", "yes")
+if DEBUG_SQL:
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+# Pool settings: SQLite connections are cheap file handles, so don't pool them;
+# server databases get a pool sized for concurrent uploads and evaluations
+if DATABASE_URL.startswith("sqlite"):
+    engine_options = {
+        "poolclass": NullPool,
+        "connect_args": {"check_same_thread": False},
+    }
+else:
+    engine_options = {
+        "pool_size": 20,
+        "max_overflow": 40,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+    }
+
 # Create async engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, echo=False, **engine_options)
+
+# WAL lets readers and writers run concurrently, and synchronous=NORMAL only
+# fsyncs at checkpoints instead of on every commit
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Apply SQLite pragmas to every new connection"""
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
 
 # Create async session factory
-async_session_maker = sessionmaker(
+async_session_maker = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+def _add_missing_columns(sync_conn):
+    """Add nullable columns added after a table already existed (create_all skips them)"""
+    inspector = inspect(sync_conn)
+    quote = sync_conn.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable or column.primary_key:
+                raise RuntimeError(
+                    f"Table {table.name} is missing required column {column.name}; "
+                    f"migrate or recreate the database"
+                )
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(
+                f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"
+            ))
+            logger.info(f"Added missing column {table.name}.{column.name}")
+
+def _create_missing_indexes(sync_conn):
+    """Create indexes added after a table already existed (create_all skips them)"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
 async def init_db():
     """Initialize database tables"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # Columns first: the new indexes cover new columns
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Get database session"""
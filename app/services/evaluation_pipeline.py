@@ -1,17 +1,21 @@
 import asyncio
 import logging
+import os
 from typing import Dict, Any
-from app.services.gemini_service import GeminiService
+from app.services.gemini_service import GeminiService, is_fallback_result
 from app.services.vector_db import get_vector_db
 from app.utils.document_processor import DocumentProcessor
 from app.models.schemas import EvaluationResult, TaskStatus
-from app.models.database import EvaluationTask
+from app.models.database import EvaluationTask, EvaluationTaskResult
 from app.services.database import async_session_maker
 from sqlalchemy import select, update
 import random
 
 logger = logging.getLogger(__name__)
 
+# Demo-only artificial delays/failures, disabled unless explicitly enabled
+SIMULATE_DELAYS = os.getenv("SIMULATE_DELAYS", "false").lower() in ("1", "true", "yes")
+
 class EvaluationPipeline:
     """Main evaluation pipeline orchestrating the 4-step AI evaluation process"""
     
@@ -23,22 +27,25 @@ class EvaluationPipeline:
         """Run the complete evaluation pipeline"""
         async with async_session_maker() as session:
             try:
-                # Update task status to processing
-                await session.execute(
+                # Claim the task only if it is still queued, so a task that was
+                # deleted, failed or already picked up is never run (again);
+                # committed so that clients polling /result can see progress
+                claim = await session.execute(
                     update(EvaluationTask)
                     .where(EvaluationTask.id == task_id)
+                    .where(EvaluationTask.status == TaskStatus.QUEUED)
                     .values(status=TaskStatus.PROCESSING)
                 )
                 await session.commit()
+                if claim.rowcount == 0:
+                    logger.warning(f"Task {task_id} is not queued, skipping evaluation")
+                    return
                 
                 # Get task details
                 result = await session.execute(
                     select(EvaluationTask).where(EvaluationTask.id == task_id)
                 )
-                task = result.scalar_one_or_none()
-                
-                if not task:
-                    raise ValueError(f"Task {task_id} not found")
+                task = result.scalar_one()
                 
                 # Simulate some processing time and potential failures
                 await self._simulate_processing_delay()
@@ -46,82 +53,89 @@ class EvaluationPipeline:
                 # Run the 4-step evaluation pipeline
                 evaluation_result = await self._execute_pipeline(task)
                 
-                # Update task with results
-                await session.execute(
-                    update(EvaluationTask)
-                    .where(EvaluationTask.id == task_id)
-                    .values(
-                        status=TaskStatus.COMPLETED,
-                        result=evaluation_result.dict()
-                    )
-                )
+                # Update task with results in a single commit
+                task.status = TaskStatus.COMPLETED
+                if is_fallback_result(evaluation_result):
+                    # Placeholder results must not be reused for identical uploads
+                    task.content_hash = None
+                session.add(EvaluationTaskResult(task_id=task.id, payload=evaluation_result.model_dump(mode="json")))
                 await session.commit()
                 
                 logger.info(f"Evaluation completed successfully for task {task_id}")
                 
-            except Exception as e:
-                logger.error(f"Evaluation failed for task {task_id}: {str(e)}")
-                # Update task with error
-                await session.execute(
-                    update(EvaluationTask)
-                    .where(EvaluationTask.id == task_id)
-                    .values(
-                        status=TaskStatus.FAILED,
-                        error_message=str(e)
+            except BaseException as e:
+                # Cancellation (e.g. the worker's job timeout) is recorded too, so the
+                # task doesn't stay in flight and capture identical submissions
+                if isinstance(e, asyncio.CancelledError):
+                    error_message = "Evaluation was cancelled or timed out"
+                else:
+                    error_message = str(e)
+                logger.error(f"Evaluation failed for task {task_id}: {error_message}")
+                try:
+                    # Discard any pending changes, then record the error
+                    await session.rollback()
+                    await session.execute(
+                        update(EvaluationTask)
+                        .where(EvaluationTask.id == task_id)
+                        .values(
+                            status=TaskStatus.FAILED,
+                            error_message=error_message
+                        )
                     )
-                )
-                await session.commit()
+                    await session.commit()
+                except Exception as db_error:
+                    logger.error(f"Failed to mark task {task_id} as failed: {db_error}")
                 raise
     
     async def _execute_pipeline(self, task: EvaluationTask) -> EvaluationResult:
         """Execute the 4-step evaluation pipeline"""
         
-        # Extract text from uploaded files
-        cv_text = await self.document_processor.extract_text_from_file(task.cv_file_path)
-        project_text = await self.document_processor.extract_text_from_file(task.project_report_path)
+        # Extract text from uploaded files concurrently
+        cv_text, project_text = await asyncio.gather(
+            self.document_processor.extract_text_from_file(task.cv_file_path),
+            self.document_processor.extract_text_from_file(task.project_report_path)
+        )
+        # Uploads are hashed on receipt; tasks created from file paths are not
+        cv_hash = task.cv_hash or await self.document_processor.compute_file_hash(task.cv_file_path)
         
         # Get vector database service
         vector_db = await get_vector_db()
         
-        # Step 1: Extract structured info from CV
-        logger.info("Step 1: Extracting structured information from CV")
-        cv_data = await self.gemini_service.extract_cv_structure(cv_text)
-        
-        # Step 2: Retrieve relevant job context for CV evaluation
-        logger.info("Step 2: Retrieving job context for CV evaluation")
-        job_context = await vector_db.retrieve_context(
-            query=f"backend developer requirements {' '.join(cv_data.skills[:5])}",
-            context_type="job_description",
-            n_results=2
-        )
-        
-        cv_context = await vector_db.retrieve_context(
-            query="CV evaluation scoring technical skills experience",
-            context_type="scoring_rubric",
-            n_results=1
+        # Retrieve job, CV rubric and project rubric context concurrently
+        logger.info("Retrieving job and rubric context")
+        job_context, cv_context, project_context = await asyncio.gather(
+            vector_db.retrieve_context(
+                query="backend developer requirements technical skills experience",
+                context_type="job_description",
+                n_results=2
+            ),
+            vector_db.retrieve_context(
+                query="CV evaluation scoring technical skills experience",
+                context_type="scoring_rubric",
+                n_results=1
+            ),
+            vector_db.retrieve_context(
+                query="project evaluation rubric code quality correctness resilience documentation",
+                context_type="scoring_rubric",
+                n_results=2
+            )
         )
         
         combined_cv_context = "\n\n".join([doc["content"] for doc in job_context + cv_context])
-        
-        # Step 3: Evaluate CV match and generate feedback
-        logger.info("Step 3: Evaluating CV match with job requirements")
-        cv_match_rate, cv_feedback, cv_evaluation = await self.gemini_service.evaluate_cv_match(
-            cv_data, task.job_description or "Backend Developer Position", combined_cv_context
-        )
-        
-        # Step 4: Retrieve project evaluation context and evaluate project
-        logger.info("Step 4: Evaluating project report")
-        project_context = await vector_db.retrieve_context(
-            query="project evaluation rubric code quality correctness resilience documentation",
-            context_type="scoring_rubric",
-            n_results=2
-        )
-        
         project_rubric = "\n\n".join([doc["content"] for doc in project_context])
         
-        project_score, project_feedback, project_evaluation = await self.gemini_service.evaluate_project_report(
-            project_text, project_rubric
+        # Steps 1-3 (CV extraction + job match) and step 4 (project report) are
+        # independent, so run both Gemini chains concurrently
+        logger.info("Steps 1-4: Evaluating CV match and project report")
+        cv_outcome, project_outcome = await asyncio.gather(
+            self.gemini_service.extract_and_match(
+                cv_text, task.job_description or "Backend Developer Position", combined_cv_context,
+                cv_hash=cv_hash
+            ),
+            self.gemini_service.evaluate_project_report(project_text, project_rubric)
         )
+        cv_data, cv_match_rate, cv_feedback, cv_evaluation = cv_outcome
+        project_score, project_feedback, project_evaluation = project_outcome
         
         # Generate overall summary
         logger.info("Generating overall evaluation summary")
@@ -142,6 +156,9 @@ class EvaluationPipeline:
     
     async def _simulate_processing_delay(self):
         """Simulate processing time and potential failures for demonstration"""
+        if not SIMULATE_DELAYS:
+            return
+        
         # Random delay between 2-8 seconds
         delay = random.uniform(2, 8)
         await asyncio.sleep(delay)
@@ -162,6 +179,6 @@ class EvaluationPipeline:
 # Global instance
 evaluation_pipeline = EvaluationPipeline()
 
-async def get_evaluation_pipeline() -> EvaluationPipeline:
+def get_evaluation_pipeline() -> EvaluationPipeline:
     """Get evaluation pipeline instance"""
     return evaluation_pipeline
\ No newline at end of file
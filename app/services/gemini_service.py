@@ -1,52 +1,583 @@
 import google.generativeai as genai
 import json
 import os
+import re
 import asyncio
-from typing import Dict, Any, Optional, List
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import hashlib
+import statistics
+import time
+import concurrent.futures
+import diskcache
+from aiolimiter import AsyncLimiter
+import tiktoken
+from json_repair import loads as json_loads
+from datetime import timedelta
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator, Type, TypeVar, Callable
+from google.api_core import exceptions as google_exceptions
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception_type
 import logging
-from app.models.schemas import ExtractedCVData, CVEvaluation, ProjectEvaluation
+from pydantic import BaseModel
+from app.models.schemas import (
+    EvaluationResult, ExtractedCVData, CVEvaluation, ProjectEvaluation,
+    CVMatchResponse, CVExtractAndMatchResponse, ProjectEvaluationResponse
+)
+from app.services.llm_cache import LLMCache
 
 logger = logging.getLogger(__name__)
 
+ResponseModel = TypeVar("ResponseModel", bound=BaseModel)
+Parsed = TypeVar("Parsed")
+
+GEMINI_MODEL = "gemini-2.0-flash"
+MAX_OUTPUT_TOKENS = 2048
+JSON_MIME_TYPE = "application/json"
+
+# Exact-match response cache on disk, shared across processes (empty disables)
+RESPONSE_CACHE_DIR = os.getenv("GEMINI_CACHE_DIR", "./.cache/gemini")
+RESPONSE_CACHE_TTL = 86400
+# Only near-deterministic calls are cached exactly
+EXACT_CACHE_MAX_TEMPERATURE = 0.1
+
+# Only transient API failures are worth retrying; bad requests, auth errors and
+# parsing failures will fail the same way again
+RETRYABLE_EXCEPTIONS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.DeadlineExceeded,
+    asyncio.TimeoutError,
+)
+
+# Worker threads for the remaining blocking calls (context cache creation and
+# disk cache access); I/O-bound, so size well above the default executor's
+# min(32, cpu_count + 4)
+GEMINI_MAX_PARALLEL = int(os.getenv("GEMINI_MAX_PARALLEL", str((os.cpu_count() or 4) * 5)))
+
+# Client-side throttling of generation calls: concurrent requests in flight and
+# requests per minute, to stay under the API quota instead of retrying 429s
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+
+# Server-side context caching of static prompt prefixes (rubrics, job
+# description, response schema). Gemini rejects caches below a minimum token
+# count, so smaller prefixes are sent inline. Off by default: with the built-in
+# job description and rubrics and the retrieved context budget, prefixes only
+# qualify for unusually long user job descriptions.
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+CONTEXT_CACHE_MODEL = "models/gemini-2.0-flash-001"
+CONTEXT_CACHE_MIN_TOKENS = 4096
+CONTEXT_CACHE_TTL = timedelta(hours=1)
+
+# Semantic response cache (opt-in: a near-duplicate prompt for a different
+# candidate would be served that candidate's earlier response)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+EMBEDDING_MODEL = "models/text-embedding-004"
+# Higher-temperature calls are meant to vary, so they are never cached
+CACHE_MAX_TEMPERATURE = 0.2
+
+# Token budgets for variable-size prompt inputs; anything beyond adds cost
+# without improving the evaluation
+CV_TEXT_TOKEN_BUDGET = 1500
+RETRIEVED_CONTEXT_TOKEN_BUDGET = 800
+CANDIDATE_LIST_TOKEN_BUDGET = 500
+TOKEN_ENCODING = "cl100k_base"
+# tiktoken downloads the encoding on first use (without a timeout) unless it is
+# already in TIKTOKEN_CACHE_DIR, so loading is bounded and retried periodically
+TOKENIZER_LOAD_TIMEOUT = 10
+TOKENIZER_RETRY_INTERVAL = 300
+
+# Initial project evaluations whose sub-scores spread less than this (and sit
+# inside the 1-5 scale, away from the clamps) are accepted without refinement
+REFINEMENT_SKIP_MAX_STDEV = 1.0
+
+# Feedback returned in place of an evaluation when a Gemini response is unusable
+CV_FALLBACK_FEEDBACK = "Unable to evaluate CV properly"
+PROJECT_FALLBACK_FEEDBACK = "Unable to evaluate project properly"
+SUMMARY_FALLBACK = "Unable to generate comprehensive summary due to evaluation errors."
+
+def is_fallback_result(result: EvaluationResult) -> bool:
+    """Whether any part of an evaluation result is a placeholder, not a real evaluation"""
+    return (result.cv_feedback == CV_FALLBACK_FEEDBACK
+            or result.project_feedback == PROJECT_FALLBACK_FEEDBACK
+            or result.overall_summary == SUMMARY_FALLBACK)
+
+# Markdown code fence the model sometimes wraps JSON in, despite the JSON mime type
+_JSON_FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
+def _strip_fence(text: str) -> str:
+    """Return the JSON inside a markdown code fence, or the stripped text"""
+    match = _JSON_FENCE.match(text)
+    return match.group(1) if match else text.strip()
+
+class UnparseableResponseError(ValueError):
+    """Gemini returned text with no recoverable JSON object"""
+
+def _parse_json_object(text: str) -> Dict[str, Any]:
+    """Parse (and repair) a JSON object from a model response"""
+    data = json_loads(_strip_fence(text))
+    if not isinstance(data, dict):
+        raise UnparseableResponseError(f"Expected a JSON object, got: {text[:100]!r}")
+    return data
+
+_encoding: Optional[tiktoken.Encoding] = None
+_next_encoding_attempt = 0.0
+
+async def load_tokenizer(timeout: float = TOKENIZER_LOAD_TIMEOUT) -> bool:
+    """Load the tokenizer used to approximate Gemini token counts, off the event loop
+    
+    Safe to call before every use: returns immediately once loaded, and after a
+    failure waits TOKENIZER_RETRY_INTERVAL before trying again.
+    """
+    global _encoding, _next_encoding_attempt
+    if _encoding is not None:
+        return True
+    if time.monotonic() < _next_encoding_attempt:
+        return False
+    # Claimed before awaiting so concurrent callers don't start parallel downloads
+    _next_encoding_attempt = time.monotonic() + TOKENIZER_RETRY_INTERVAL
+    try:
+        _encoding = await asyncio.wait_for(
+            asyncio.to_thread(tiktoken.get_encoding, TOKEN_ENCODING), timeout
+        )
+        return True
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, truncating by characters: {e!r}")
+        return False
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Truncate text to at most max_tokens tokens"""
+    encoding = _encoding
+    if encoding is None:
+        # Same ~4 characters per token estimate as the context cache gate
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def _join_entries(entries: List[str], separator: str = "; ",
+                  max_tokens: int = CANDIDATE_LIST_TOKEN_BUDGET) -> str:
+    """Join non-empty entries and truncate the result to max_tokens tokens"""
+    return _truncate(separator.join(entry for entry in entries if entry.strip()), max_tokens)
+
+CV_MATCH_RESPONSE_FORMAT = """
+        Provide evaluation in JSON format:
+        {
+            "match_rate": 0.0-1.0,
+            "feedback": "detailed feedback string",
+            "detailed_scores": {
+                "technical_skills_match": 1-5,
+                "experience_level": 1-5,
+                "relevant_achievements": 1-5,
+                "cultural_fit": 1-5,
+                "overall_score": 1-5
+            }
+        }
+        """
+
+PROJECT_EVALUATION_RESPONSE_FORMAT = """
+        Provide initial evaluation in JSON format:
+        {
+            "score": 1.0-10.0,
+            "feedback": "detailed feedback",
+            "detailed_scores": {
+                "correctness": 1-5,
+                "code_quality": 1-5,
+                "resilience": 1-5,
+                "documentation": 1-5,
+                "creativity": 1-5,
+                "overall_score": 1-5
+            }
+        }
+        """
+
+CV_EXTRACT_AND_MATCH_RESPONSE_FORMAT = """
+        Return ONLY the JSON, no additional text or formatting:
+        {
+            "extracted": {
+                "skills": ["skill1", "skill2", ...],
+                "experiences": ["experience1", "experience2", ...],
+                "projects": ["project1", "project2", ...],
+                "education": ["education1", "education2", ...],
+                "years_of_experience": number_or_null,
+                "achievements": ["achievement1", "achievement2", ...]
+            },
+            "evaluation": {
+                "match_rate": 0.0-1.0,
+                "feedback": "detailed feedback string",
+                "detailed_scores": {
+                    "technical_skills_match": 1-5,
+                    "experience_level": 1-5,
+                    "relevant_achievements": 1-5,
+                    "cultural_fit": 1-5,
+                    "overall_score": 1-5
+                }
+            }
+        }
+        """
+
+@lru_cache(maxsize=64)
+def build_cv_extract_and_match_prompt(job_description: str, retrieved_context: str) -> str:
+    """Build the static prefix of the fused CV extraction + match prompt"""
+    return f"""
+        You are an expert HR evaluator. First extract structured information from the
+        CV text below, then analyze how well the candidate matches the job requirements.
+        
+        Job Description:
+        {job_description}
+        
+        Additional Context:
+        {retrieved_context}
+        """ + CV_EXTRACT_AND_MATCH_RESPONSE_FORMAT
+
+@lru_cache(maxsize=64)
+def build_cv_prompt(job_description: str, retrieved_context: str) -> str:
+    """Build the static (job-specific) prefix of the CV match prompt
+    
+    Everything that is shared between candidates comes first so the prefix can
+    be reused; candidate data is appended last.
+    """
+    return f"""
+        You are an expert HR evaluator. Analyze how well this candidate matches the job requirements.
+        
+        Job Description:
+        {job_description}
+        
+        Additional Context:
+        {retrieved_context}
+        """ + CV_MATCH_RESPONSE_FORMAT
+
+@lru_cache(maxsize=64)
+def build_project_prompt(scoring_rubric: str) -> str:
+    """Build the static (rubric-specific) prefix of the project evaluation prompt"""
+    return f"""
+        Evaluate the project report below based on the scoring rubric.
+        
+        Scoring Rubric:
+        {scoring_rubric}
+        """ + PROJECT_EVALUATION_RESPONSE_FORMAT
+
 class GeminiService:
     """Service for interacting with Gemini API with retry logic and prompt chaining"""
     
-    def __init__(self):
+    def __init__(self, max_parallel_requests: int = GEMINI_MAX_PARALLEL):
         self.api_key = os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_parallel_requests, thread_name_prefix="gemini"
+        )
+        # No transport override: the SDK pairs the sync clients with grpc and the
+        # async clients (generate_content_async, embed_content_async) with
+        # grpc_asyncio; forcing "grpc" would run the async calls on the blocking
+        # transport
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        self.model = genai.GenerativeModel(GEMINI_MODEL)
+        self._semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+        self._rate_limiter = AsyncLimiter(max_rate=GEMINI_REQUESTS_PER_MINUTE, time_period=60)
+        self.response_cache = diskcache.Cache(RESPONSE_CACHE_DIR) if RESPONSE_CACHE_DIR else None
+        # sha256(prefix) -> (model bound to the cached prefix or None, expiry time)
+        self._context_models: Dict[str, Tuple[Optional[genai.GenerativeModel], float]] = {}
+        # Per-prefix locks so concurrent requests create one CachedContent, not one each
+        self._context_locks: Dict[str, asyncio.Lock] = {}
+        self.llm_cache = (
+            LLMCache(self._embed_prompt, threshold=SEMANTIC_CACHE_THRESHOLD)
+            if SEMANTIC_CACHE_ENABLED else None
+        )
+    
+    async def _embed_prompt(self, prompt: str) -> List[float]:
+        """Embed a prompt for semantic cache lookups"""
+        response = await genai.embed_content_async(model=EMBEDDING_MODEL, content=prompt)
+        return response["embedding"]
+    
+    @staticmethod
+    def _response_cache_key(prompt: str, temperature: float, json_mode: bool) -> str:
+        """Deterministic cache key over the model, prompt and generation parameters"""
+        payload = {"m": GEMINI_MODEL, "p": prompt, "t": temperature, "mx": MAX_OUTPUT_TOKENS, "j": json_mode}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    
+    async def _get_context_cached_model(self, static_prefix: str) -> Optional[genai.GenerativeModel]:
+        """Return a model bound to a server-side cache of static_prefix, if supported"""
+        # Rough estimate (~4 characters per token) to skip prefixes Gemini won't cache
+        if not CONTEXT_CACHE_ENABLED or len(static_prefix) < CONTEXT_CACHE_MIN_TOKENS * 4:
+            return None
+        
+        key = hashlib.sha256(static_prefix.encode()).hexdigest()
+        entry = self._context_models.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        
+        async with self._context_locks.setdefault(key, asyncio.Lock()):
+            # Another request may have created the cache while this one waited
+            entry = self._context_models.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            
+            model = None
+            try:
+                loop = asyncio.get_event_loop()
+                cache = await loop.run_in_executor(
+                    self._executor,
+                    lambda: genai.caching.CachedContent.create(
+                        model=CONTEXT_CACHE_MODEL,
+                        contents=[static_prefix],
+                        ttl=CONTEXT_CACHE_TTL
+                    )
+                )
+                model = genai.GenerativeModel.from_cached_content(cached_content=cache)
+            except Exception as e:
+                logger.warning(f"Context caching unavailable, sending prompt inline: {e}")
+            
+            # Refresh slightly before the server-side cache expires; failures are
+            # remembered for the same period instead of being retried every call
+            self._context_models[key] = (model, time.monotonic() + CONTEXT_CACHE_TTL.total_seconds() - 60)
+            return model
+    
+    async def generate_content_async(self, prompt: str, temperature: float = 0.1,
+                                     static_prefix: Optional[str] = None, json_mode: bool = False) -> str:
+        """Generate content, serving low-temperature prompts from the caches when possible
+        
+        static_prefix is the part of the prompt shared between requests; when it is
+        large enough it is cached server-side and only prompt is sent. json_mode
+        makes Gemini return a bare JSON document.
+        """
+        return await self._generate_and_parse(
+            prompt, lambda text: text, temperature, static_prefix, json_mode
+        )
+    
+    async def _generate_and_parse(self, prompt: str, parse: Callable[[str], Parsed],
+                                  temperature: float = 0.1, static_prefix: Optional[str] = None,
+                                  json_mode: bool = False) -> Parsed:
+        """Generate content and parse it, caching only responses that parse
+        
+        parse raises ValueError for unusable responses; those are never cached, and
+        cached responses that no longer parse are regenerated.
+        """
+        full_prompt = static_prefix + prompt if static_prefix else prompt
+        
+        # Exact-match tier: identical prompt and parameters
+        use_exact_cache = self.response_cache is not None and temperature <= EXACT_CACHE_MAX_TEMPERATURE
+        cache_key = None
+        if use_exact_cache:
+            cache_key = self._response_cache_key(full_prompt, temperature, json_mode)
+            cached = await asyncio.get_event_loop().run_in_executor(
+                self._executor, self.response_cache.get, cache_key
+            )
+            if cached is not None:
+                try:
+                    return parse(cached)
+                except ValueError as e:
+                    logger.warning(f"Ignoring unparseable cached response: {e}")
+        
+        # Semantic tier: near-duplicate prompts
+        use_semantic_cache = self.llm_cache is not None and temperature <= CACHE_MAX_TEMPERATURE
+        embedding = None
+        if use_semantic_cache:
+            cached, embedding = await self.llm_cache.lookup(full_prompt)
+            if cached is not None:
+                try:
+                    return parse(cached)
+                except ValueError as e:
+                    logger.warning(f"Ignoring unparseable semantic cache hit: {e}")
+        
+        cached_model = await self._get_context_cached_model(static_prefix) if static_prefix else None
+        request_prompt = prompt if cached_model is not None else full_prompt
+        if json_mode:
+            text = await self._generate_json_streamed(request_prompt, temperature, cached_model)
+        else:
+            text = await self._generate_content(request_prompt, temperature, model=cached_model)
+        
+        # Raises before anything is cached if the response is unusable
+        parsed = parse(text)
+        
+        if use_exact_cache:
+            await asyncio.get_event_loop().run_in_executor(
+                self._executor,
+                lambda: self.response_cache.set(cache_key, text, expire=RESPONSE_CACHE_TTL)
+            )
+        if use_semantic_cache:
+            self.llm_cache.store(embedding, text)
+        return parsed
         
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type((Exception,))
+        wait=wait_exponential_jitter(initial=1, max=10),
+        retry=retry_if_exception_type(RETRYABLE_EXCEPTIONS),
+        reraise=True
     )
-    async def generate_content_async(self, prompt: str, temperature: float = 0.1) -> str:
-        """Generate content with retry logic"""
+    async def _generate_content(self, prompt: str, temperature: float,
+                                model: Optional[genai.GenerativeModel] = None) -> str:
+        """Generate plain-text content with retry logic (JSON goes through _generate_json_streamed)"""
+        model = model or self.model
         try:
-            # Simulate async behavior since genai doesn't have native async support
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None, 
-                lambda: self.model.generate_content(
+            async with self._semaphore, self._rate_limiter:
+                response = await model.generate_content_async(
                     prompt,
                     generation_config=genai.types.GenerationConfig(
                         temperature=temperature,
-                        max_output_tokens=2048,
+                        max_output_tokens=MAX_OUTPUT_TOKENS,
                     )
                 )
-            )
-            return response.text
+                return response.text
         except Exception as e:
             logger.error(f"Error generating content with Gemini: {str(e)}")
             raise
     
-    async def extract_cv_structure(self, cv_text: str) -> ExtractedCVData:
-        """Step 1: Extract structured information from CV"""
+    async def stream_content(self, prompt: str, temperature: float = 0.1, json_mode: bool = False,
+                             model: Optional[genai.GenerativeModel] = None) -> AsyncIterator[str]:
+        """Yield response text chunks as Gemini generates them (no caching or retries)"""
+        model = model or self.model
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=MAX_OUTPUT_TOKENS,
+                response_mime_type=JSON_MIME_TYPE if json_mode else None,
+            ),
+            stream=True
+        )
+        async for chunk in response:
+            # The final chunk may carry only the finish reason
+            if chunk.parts:
+                yield chunk.text
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential_jitter(initial=1, max=10),
+        retry=retry_if_exception_type(RETRYABLE_EXCEPTIONS),
+        reraise=True
+    )
+    async def _generate_json_streamed(self, prompt: str, temperature: float,
+                                      model: Optional[genai.GenerativeModel] = None) -> str:
+        """Stream a JSON response, returning as soon as the buffer is a complete document"""
+        buffer = ""
+        stream = self.stream_content(prompt, temperature, json_mode=True, model=model)
+        try:
+            async with self._semaphore, self._rate_limiter:
+                async for text in stream:
+                    buffer += text
+                    # Strict parsing only succeeds once the document is closed; json_repair
+                    # would accept any prefix, so it is left to the callers
+                    if buffer.rstrip().endswith(("}", "]")):
+                        try:
+                            json.loads(buffer)
+                            return buffer
+                        except ValueError:
+                            pass
+                return buffer
+        except Exception as e:
+            logger.error(f"Error streaming content from Gemini: {str(e)}")
+            raise
+        finally:
+            await stream.aclose()
+    
+    async def _get_cached_cv_structure(self, cv_hash: Optional[str]) -> Optional[ExtractedCVData]:
+        """Return the structure previously extracted from the CV with this content hash"""
+        if not cv_hash or self.response_cache is None:
+            return None
+        cached = await asyncio.get_event_loop().run_in_executor(
+            self._executor, self.response_cache.get, f"cv_struct:{cv_hash}"
+        )
+        if cached is None:
+            return None
+        try:
+            return ExtractedCVData.model_validate_json(cached)
+        except ValueError as e:
+            logger.warning(f"Discarding unreadable cached CV structure: {e}")
+            return None
+    
+    async def _store_cv_structure(self, cv_hash: Optional[str], cv_data: ExtractedCVData):
+        """Remember the structure extracted from a CV, which doesn't depend on the job"""
+        if not cv_hash or self.response_cache is None:
+            return
+        await asyncio.get_event_loop().run_in_executor(
+            self._executor,
+            lambda: self.response_cache.set(
+                f"cv_struct:{cv_hash}", cv_data.model_dump_json(), expire=RESPONSE_CACHE_TTL
+            )
+        )
+    
+    async def _call_and_parse_json(self, prompt: str, schema: Type[ResponseModel],
+                                   temperature: float = 0.1,
+                                   static_prefix: Optional[str] = None) -> ResponseModel:
+        """Generate a JSON response and validate it against schema
+        
+        Raises UnparseableResponseError when the response holds no JSON object, and
+        pydantic's ValidationError when the object violates the schema (e.g. a
+        score out of range); callers only fall back on the former, so real
+        violations fail the evaluation instead of hiding behind placeholder scores.
+        """
+        return await self._generate_and_parse(
+            prompt,
+            lambda text: schema.model_validate(_parse_json_object(text)),
+            temperature,
+            static_prefix,
+            json_mode=True
+        )
+    
+    async def extract_and_match(self, cv_text: str, job_description: str, retrieved_context: str,
+                                cv_hash: Optional[str] = None) -> tuple[ExtractedCVData, float, str, CVEvaluation]:
+        """Steps 1-3 in one call: extract CV structure and evaluate the job match
+        
+        The extracted structure doesn't depend on the job, so when cv_hash (sha256
+        of the CV file) is given it is memoized; for a CV seen before only the
+        smaller match prompt, without the CV text, is sent.
+        """
+        cached_cv_data = await self._get_cached_cv_structure(cv_hash)
+        if cached_cv_data is not None:
+            match_rate, feedback, cv_evaluation = await self.evaluate_cv_match(
+                cached_cv_data, job_description, retrieved_context
+            )
+            return cached_cv_data, match_rate, feedback, cv_evaluation
+        
+        await load_tokenizer()
+        cv_section = f"""
+        CV Text:
+        {_truncate(cv_text, CV_TEXT_TOKEN_BUDGET)}
+        """
+        
+        try:
+            response = await self._call_and_parse_json(
+                cv_section,
+                CVExtractAndMatchResponse,
+                static_prefix=build_cv_extract_and_match_prompt(
+                    job_description, _truncate(retrieved_context, RETRIEVED_CONTEXT_TOKEN_BUDGET)
+                )
+            )
+            await self._store_cv_structure(cv_hash, response.extracted)
+            evaluation = response.evaluation
+            return response.extracted, evaluation.match_rate, evaluation.feedback, evaluation.detailed_scores
+            
+        except UnparseableResponseError as e:
+            logger.error(f"Failed to parse fused CV extraction and evaluation: {e}")
+            return (
+                ExtractedCVData(
+                    skills=[], experiences=[], projects=[],
+                    education=[], achievements=[], years_of_experience=None
+                ),
+                0.5,
+                CV_FALLBACK_FEEDBACK,
+                CVEvaluation(
+                    technical_skills_match=3, experience_level=3, relevant_achievements=3,
+                    cultural_fit=3, overall_score=3
+                )
+            )
+    
+    async def extract_cv_structure(self, cv_text: str, cv_hash: Optional[str] = None) -> ExtractedCVData:
+        """Step 1: Extract structured information from CV
+        
+        When cv_hash (sha256 of the CV file) is given, the result is memoized
+        across evaluations of the same CV.
+        
+        Deprecated: use extract_and_match, which also evaluates the match in the same call.
+        """
+        cached = await self._get_cached_cv_structure(cv_hash)
+        if cached is not None:
+            return cached
+        
+        await load_tokenizer()
         prompt = f"""
         Analyze the following CV text and extract structured information in JSON format.
         Return ONLY the JSON, no additional text or formatting.
@@ -62,21 +593,14 @@ class GeminiService:
         }}
         
         CV Text:
-        {cv_text}
+        {_truncate(cv_text, CV_TEXT_TOKEN_BUDGET)}
         """
         
         try:
-            response = await self.generate_content_async(prompt)
-            # Clean response and parse JSON
-            json_text = response.strip()
-            if json_text.startswith('```json'):
-                json_text = json_text[7:-3]
-            elif json_text.startswith('```'):
-                json_text = json_text[3:-3]
-            
-            data = json.loads(json_text)
-            return ExtractedCVData(**data)
-        except json.JSONDecodeError as e:
+            cv_data = await self._call_and_parse_json(prompt, ExtractedCVData)
+            await self._store_cv_structure(cv_hash, cv_data)
+            return cv_data
+        except UnparseableResponseError as e:
             logger.error(f"Failed to parse JSON from CV extraction: {e}")
             # Return default structure if parsing fails
             return ExtractedCVData(
@@ -86,101 +610,66 @@ class GeminiService:
     
     async def evaluate_cv_match(self, cv_data: ExtractedCVData, job_description: str, 
                                retrieved_context: str) -> tuple[float, str, CVEvaluation]:
-        """Step 2 & 3: Compare CV with job requirements and generate match rate"""
-        prompt = f"""
-        You are an expert HR evaluator. Analyze how well this candidate matches the job requirements.
-        
-        Job Description:
-        {job_description}
-        
-        Additional Context:
-        {retrieved_context}
+        """Step 2 & 3: Compare CV with job requirements and generate match rate
         
+        Used by extract_and_match when the CV structure is already known.
+        """
+        await load_tokenizer()
+        candidate_section = f"""
         Candidate Data:
         - Skills: {', '.join(cv_data.skills)}
         - Experience: {cv_data.years_of_experience} years
-        - Experiences: {'; '.join(cv_data.experiences)}
-        - Projects: {'; '.join(cv_data.projects)}
+        - Experiences: {_join_entries(cv_data.experiences)}
+        - Projects: {_join_entries(cv_data.projects)}
         - Education: {'; '.join(cv_data.education)}
         - Achievements: {'; '.join(cv_data.achievements)}
-        
-        Provide evaluation in JSON format:
-        {{
-            "match_rate": 0.0-1.0,
-            "feedback": "detailed feedback string",
-            "detailed_scores": {{
-                "technical_skills_match": 1-5,
-                "experience_level": 1-5,
-                "relevant_achievements": 1-5,
-                "cultural_fit": 1-5,
-                "overall_score": 1-5
-            }}
-        }}
         """
-        
         try:
-            response = await self.generate_content_async(prompt)
-            json_text = response.strip()
-            if json_text.startswith('```json'):
-                json_text = json_text[7:-3]
-            elif json_text.startswith('```'):
-                json_text = json_text[3:-3]
-            
-            data = json.loads(json_text)
-            cv_evaluation = CVEvaluation(**data['detailed_scores'])
-            return data['match_rate'], data['feedback'], cv_evaluation
+            response = await self._call_and_parse_json(
+                candidate_section,
+                CVMatchResponse,
+                static_prefix=build_cv_prompt(
+                    job_description, _truncate(retrieved_context, RETRIEVED_CONTEXT_TOKEN_BUDGET)
+                )
+            )
+            return response.match_rate, response.feedback, response.detailed_scores
             
-        except (json.JSONDecodeError, KeyError) as e:
+        except UnparseableResponseError as e:
             logger.error(f"Failed to parse CV evaluation: {e}")
-            return 0.5, "Unable to evaluate CV properly", CVEvaluation(
+            return 0.5, CV_FALLBACK_FEEDBACK, CVEvaluation(
                 technical_skills_match=3, experience_level=3, relevant_achievements=3,
                 cultural_fit=3, overall_score=3
             )
     
     async def evaluate_project_report(self, project_text: str, scoring_rubric: str) -> tuple[float, str, ProjectEvaluation]:
-        """Step 4: Evaluate project report with refinement"""
-        
-        # First evaluation
-        initial_prompt = f"""
-        Evaluate this project report based on the scoring rubric.
-        
-        Scoring Rubric:
-        {scoring_rubric}
+        """Step 4: Evaluate project report, refining ambiguous initial scores"""
         
+        # First evaluation (static rubric and schema first, report last)
+        report_section = f"""
         Project Report:
         {project_text}
-        
-        Provide initial evaluation in JSON format:
-        {{
-            "score": 1.0-10.0,
-            "feedback": "detailed feedback",
-            "detailed_scores": {{
-                "correctness": 1-5,
-                "code_quality": 1-5,
-                "resilience": 1-5,
-                "documentation": 1-5,
-                "creativity": 1-5,
-                "overall_score": 1-5
-            }}
-        }}
         """
         
         try:
-            initial_response = await self.generate_content_async(initial_prompt, temperature=0.2)
-            json_text = initial_response.strip()
-            if json_text.startswith('```json'):
-                json_text = json_text[7:-3]
-            elif json_text.startswith('```'):
-                json_text = json_text[3:-3]
+            initial = await self._call_and_parse_json(
+                report_section,
+                ProjectEvaluationResponse,
+                temperature=0.2,
+                static_prefix=build_project_prompt(scoring_rubric)
+            )
             
-            initial_data = json.loads(json_text)
+            # Consistent, unclamped scores leave nothing for a refinement pass to fix
+            sub_scores = list(initial.detailed_scores.model_dump().values())
+            if (statistics.pstdev(sub_scores) < REFINEMENT_SKIP_MAX_STDEV
+                    and min(sub_scores) > 1 and max(sub_scores) < 5):
+                return initial.score, initial.feedback, initial.detailed_scores
             
             # Second evaluation for refinement
             refinement_prompt = f"""
             Review and refine this project evaluation. Consider if the scoring is fair and consistent.
             
             Initial Evaluation:
-            {json.dumps(initial_data, indent=2)}
+            {initial.model_dump_json(indent=2)}
             
             Project Report (for reference):
             {project_text[:1000]}...
@@ -188,21 +677,14 @@ class GeminiService:
             Provide refined evaluation in the same JSON format, but ensure consistency and fairness.
             """
             
-            refined_response = await self.generate_content_async(refinement_prompt, temperature=0.1)
-            json_text = refined_response.strip()
-            if json_text.startswith('```json'):
-                json_text = json_text[7:-3]
-            elif json_text.startswith('```'):
-                json_text = json_text[3:-3]
-            
-            refined_data = json.loads(json_text)
-            project_evaluation = ProjectEvaluation(**refined_data['detailed_scores'])
-            
-            return refined_data['score'], refined_data['feedback'], project_evaluation
+            refined = await self._call_and_parse_json(
+                refinement_prompt, ProjectEvaluationResponse, temperature=0.1
+            )
+            return refined.score, refined.feedback, refined.detailed_scores
             
-        except (json.JSONDecodeError, KeyError) as e:
+        except UnparseableResponseError as e:
             logger.error(f"Failed to parse project evaluation: {e}")
-            return 5.0, "Unable to evaluate project properly", ProjectEvaluation(
+            return 5.0, PROJECT_FALLBACK_FEEDBACK, ProjectEvaluation(
                 correctness=3, code_quality=3, resilience=3,
                 documentation=3, creativity=3, overall_score=3
             )
@@ -227,4 +709,4 @@ class GeminiService:
             return await self.generate_content_async(prompt, temperature=0.3)
         except Exception as e:
             logger.error(f"Failed to generate overall summary: {e}")
-            return "Unable to generate comprehensive summary due to evaluation errors."
\ No newline at end of file
+            return SUMMARY_FALLBACK
\ No newline at end of file
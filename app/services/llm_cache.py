@@ -0,0 +1,89 @@
+import time
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """In-memory semantic cache of LLM responses keyed by prompt embeddings
+
+    Prompts are embedded and stored as rows of a normalized float32 matrix, so a
+    lookup is a single matrix-vector product followed by an argmax. A hit is any
+    unexpired entry whose cosine similarity is at or above the threshold.
+    """
+
+    def __init__(self, embed_fn: Callable[[str], Awaitable[List[float]]],
+                 threshold: float = 0.95, max_entries: int = 10000, ttl: float = 86400):
+        self._embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._matrix: Optional[np.ndarray] = None
+        self._responses: List[str] = []
+        self._expires_at = np.zeros(0, dtype=np.float64)
+        self._last_used = np.zeros(0, dtype=np.float64)
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "errors": 0}
+
+    async def lookup(self, prompt: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Return (cached response or None, prompt embedding for a later store)"""
+        try:
+            embedding = np.asarray(await self._embed_fn(prompt), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Failed to embed prompt for LLM cache: {e}")
+            self.stats["errors"] += 1
+            return None, None
+
+        norm = np.linalg.norm(embedding)
+        if norm == 0:
+            return None, None
+        embedding /= norm
+
+        size = len(self._responses)
+        if size:
+            scores = self._matrix[:size] @ embedding
+            scores[self._expires_at[:size] < time.time()] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                self._last_used[best] = time.time()
+                self.stats["hits"] += 1
+                return self._responses[best], embedding
+
+        self.stats["misses"] += 1
+        return None, embedding
+
+    def store(self, embedding: Optional[np.ndarray], response: str) -> None:
+        """Store a response under the embedding returned by lookup()"""
+        if embedding is None:
+            return
+
+        now = time.time()
+        size = len(self._responses)
+        if size >= self.max_entries:
+            # Evict the least recently used entry and reuse its row
+            row = int(np.argmin(self._last_used[:size]))
+            self._responses[row] = response
+        else:
+            self._ensure_capacity(size + 1, embedding.shape[0])
+            row = size
+            self._responses.append(response)
+
+        self._matrix[row] = embedding
+        self._expires_at[row] = now + self.ttl
+        self._last_used[row] = now
+
+    def _ensure_capacity(self, needed: int, dim: int) -> None:
+        """Grow the backing arrays geometrically, up to max_entries rows"""
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = min(self.max_entries, max(needed, capacity * 2, 64))
+        matrix = np.zeros((new_capacity, dim), dtype=np.float32)
+        expires_at = np.zeros(new_capacity, dtype=np.float64)
+        last_used = np.zeros(new_capacity, dtype=np.float64)
+        if capacity:
+            matrix[:capacity] = self._matrix
+            expires_at[:capacity] = self._expires_at
+            last_used[:capacity] = self._last_used
+        self._matrix, self._expires_at, self._last_used = matrix, expires_at, last_used
\ No newline at end of file
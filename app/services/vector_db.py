@@ -1,22 +1,55 @@
 import os
+import re
 import asyncio
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+import numpy as np
+import google.generativeai as genai
+from sklearn.feature_extraction.text import TfidfVectorizer
+from app.services.gemini_service import EMBEDDING_MODEL
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of (query, context_type, n_results) results kept in memory
+RETRIEVAL_CACHE_SIZE = 256
+
+# Embedding-based retrieval (opt-in: needs the Gemini API at startup). Documents
+# are embedded once in batches; each distinct query costs one embedding call.
+EMBEDDINGS_ENABLED = os.getenv("VECTOR_DB_EMBEDDINGS_ENABLED", "false").lower() in ("1", "true", "yes")
+EMBEDDING_BATCH_SIZE = 32
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, shared by document indexing and queries"""
+    return _TOKEN_RE.findall(text.lower())
+
 class VectorDBService:
-    """Simple in-memory vector database service for storing evaluation context"""
+    """In-memory vector database service for storing evaluation context
+    
+    Documents are indexed as L2-normalized TF-IDF vectors, so retrieval is a
+    sparse matrix-vector product giving cosine similarity for every document.
+    When embeddings are enabled, a dense float32 matrix of normalized document
+    embeddings is scored the same way, falling back to TF-IDF on API errors.
+    """
     
     def __init__(self):
         self.documents = {}
         self.initialized = False
+        self._retrieval_cache: "OrderedDict[Tuple[str, Optional[str], int], List[Dict[str, Any]]]" = OrderedDict()
+        self._doc_ids: List[str] = []
+        self._doc_types = np.array([], dtype=object)
+        self._vectorizer: Optional[TfidfVectorizer] = None
+        self._matrix = None
+        self._doc_embeddings: Optional[np.ndarray] = None
     
     async def initialize(self):
         """Initialize vector database with default data"""
         try:
             if not self.initialized:
                 await self._populate_initial_data()
+                await self._embed_documents()
                 self.initialized = True
                 logger.info("In-memory vector database initialized successfully")
                 
@@ -152,41 +185,104 @@ class VectorDBService:
         for data in default_data:
             self.documents[data["id"]] = data
         
+        self._rebuild_index()
         logger.info(f"Populated vector database with {len(default_data)} default documents")
     
+    def _rebuild_index(self):
+        """Fit the TF-IDF vectorizer and document matrix over all stored documents"""
+        self._doc_ids = list(self.documents.keys())
+        self._doc_types = np.array([self.documents[doc_id]["type"] for doc_id in self._doc_ids], dtype=object)
+        if not self._doc_ids:
+            self._vectorizer, self._matrix = None, None
+            return
+        contents = [self.documents[doc_id]["content"] for doc_id in self._doc_ids]
+        self._vectorizer = TfidfVectorizer(tokenizer=_tokenize, lowercase=False, token_pattern=None)
+        self._matrix = self._vectorizer.fit_transform(contents)
+    
+    @staticmethod
+    async def _embed(texts: List[str], task_type: str) -> np.ndarray:
+        """Embed texts in batches into a matrix of L2-normalized float32 rows"""
+        embeddings = []
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            response = await genai.embed_content_async(
+                model=EMBEDDING_MODEL,
+                content=texts[start:start + EMBEDDING_BATCH_SIZE],
+                task_type=task_type
+            )
+            embeddings.extend(response["embedding"])
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+    
+    async def _embed_documents(self):
+        """Embed all stored documents once, in _doc_ids order"""
+        self._doc_embeddings = None
+        if not EMBEDDINGS_ENABLED or not self._doc_ids:
+            return
+        try:
+            contents = [self.documents[doc_id]["content"] for doc_id in self._doc_ids]
+            self._doc_embeddings = await self._embed(contents, "retrieval_document")
+            logger.info(f"Embedded {len(contents)} documents for retrieval")
+        except Exception as e:
+            logger.warning(f"Document embedding failed, using TF-IDF retrieval: {e}")
+    
+    async def _embedding_scores(self, query: str) -> Optional[np.ndarray]:
+        """Cosine similarity of the query against every document embedding"""
+        try:
+            query_embedding = (await self._embed([query], "retrieval_query"))[0]
+        except Exception as e:
+            logger.warning(f"Query embedding failed, using TF-IDF retrieval: {e}")
+            return None
+        return self._doc_embeddings @ query_embedding
+    
     async def retrieve_context(self, query: str, context_type: str = None, n_results: int = 3) -> List[Dict[str, Any]]:
-        """Retrieve relevant context based on query (simple keyword matching)"""
+        """Retrieve relevant context based on query (embedding or TF-IDF cosine similarity)"""
+        # Most pipeline queries are static, so serve repeats from the LRU cache
+        cache_key = (query, context_type, n_results)
+        cached = self._retrieval_cache.get(cache_key)
+        if cached is not None:
+            self._retrieval_cache.move_to_end(cache_key)
+            return list(cached)
+        
         try:
             retrieved_docs = []
             
-            # Simple keyword-based retrieval
-            query_words = query.lower().split()
+            scores = None
+            if self._doc_embeddings is not None:
+                scores = await self._embedding_scores(query)
+                if scores is not None and context_type:
+                    scores[self._doc_types != context_type] = 0.0
             
-            for doc_id, doc_data in self.documents.items():
-                # Filter by type if specified
-                if context_type and doc_data["type"] != context_type:
-                    continue
-                
-                # Simple scoring based on keyword matches
-                content_lower = doc_data["content"].lower()
-                score = sum(1 for word in query_words if word in content_lower)
+            if scores is None and self._vectorizer is not None:
+                query_vector = self._vectorizer.transform([query])
+                scores = (self._matrix @ query_vector.T).toarray().ravel()
                 
-                if score > 0:
+                # Filter by type if specified
+                if context_type:
+                    scores[self._doc_types != context_type] = 0.0
+            
+            if scores is not None:
+                # Highest scoring documents with a positive score, best first
+                for index in np.argsort(-scores)[:n_results]:
+                    if scores[index] <= 0:
+                        break
+                    doc_data = self.documents[self._doc_ids[index]]
                     retrieved_docs.append({
                         "content": doc_data["content"],
                         "metadata": {
                             "type": doc_data["type"],
                             "category": doc_data["category"]
                         },
-                        "score": score
+                        "score": float(scores[index])
                     })
             
-            # Sort by score and limit results
-            retrieved_docs.sort(key=lambda x: x["score"], reverse=True)
-            retrieved_docs = retrieved_docs[:n_results]
-            
             logger.info(f"Retrieved {len(retrieved_docs)} documents for query: {query[:50]}...")
-            return retrieved_docs
+            
+            self._retrieval_cache[cache_key] = retrieved_docs
+            if len(self._retrieval_cache) > RETRIEVAL_CACHE_SIZE:
+                self._retrieval_cache.popitem(last=False)
+            
+            return list(retrieved_docs)
             
         except Exception as e:
             logger.error(f"Error retrieving context: {e}")
@@ -201,6 +297,10 @@ class VectorDBService:
                 "type": doc_type,
                 "category": category
             }
+            # Re-index, and drop cached retrievals for the old document set
+            self._rebuild_index()
+            await self._embed_documents()
+            self._retrieval_cache.clear()
             logger.info(f"Added document {doc_id} to vector database")
         except Exception as e:
             logger.error(f"Error adding document: {e}")
@@ -1,5 +1,7 @@
 import os
-import PyPDF2
+import asyncio
+import hashlib
+import pypdfium2 as pdfium
 from docx import Document
 import aiofiles
 from typing import Optional
@@ -7,6 +9,19 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Read size when hashing files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Number of leading bytes needed to recognise a file signature
+FILE_SIGNATURE_LENGTH = 8
+
+# Known magic prefixes per extension (DOCX is a ZIP container, DOC is OLE2)
+FILE_SIGNATURES = {
+    '.pdf': (b'%PDF-',),
+    '.docx': (b'PK\x03\x04',),
+    '.doc': (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', b'PK\x03\x04'),
+}
+
 class DocumentProcessor:
     """Utility class for processing different document formats"""
     
@@ -29,33 +44,63 @@ class DocumentProcessor:
             logger.error(f"Error extracting text from {file_path}: {str(e)}")
             raise
     
+    @staticmethod
+    async def compute_file_hash(file_path: str) -> str:
+        """Return the sha256 hex digest of a file's contents"""
+        return await asyncio.to_thread(DocumentProcessor._compute_file_hash_sync, file_path)
+    
+    @staticmethod
+    def _compute_file_hash_sync(file_path: str) -> str:
+        """Hash a file in chunks without loading it into memory"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
     @staticmethod
     async def _extract_from_pdf(file_path: str) -> str:
         """Extract text from PDF file"""
         try:
-            text = ""
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-            return text
+            # PDFium parsing is native and blocking, so keep it off the event loop
+            return await asyncio.to_thread(DocumentProcessor._extract_from_pdf_sync, file_path)
         except Exception as e:
             logger.error(f"Error reading PDF file {file_path}: {str(e)}")
             raise
     
+    @staticmethod
+    def _extract_from_pdf_sync(file_path: str) -> str:
+        """Extract text from PDF file with PDFium"""
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            parts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                try:
+                    parts.append(textpage.get_text_range())
+                finally:
+                    textpage.close()
+                    page.close()
+            return "\n".join(parts)
+        finally:
+            pdf.close()
+    
     @staticmethod
     async def _extract_from_docx(file_path: str) -> str:
         """Extract text from DOCX file"""
         try:
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            # Unzipping and XML parsing are blocking, so keep them off the event loop
+            return await asyncio.to_thread(DocumentProcessor._extract_from_docx_sync, file_path)
         except Exception as e:
             logger.error(f"Error reading DOCX file {file_path}: {str(e)}")
             raise
     
+    @staticmethod
+    def _extract_from_docx_sync(file_path: str) -> str:
+        """Extract text from DOCX file with python-docx"""
+        doc = Document(file_path)
+        return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+    
     @staticmethod
     async def _extract_from_txt(file_path: str) -> str:
         """Extract text from TXT file"""
@@ -82,4 +127,15 @@ class DocumentProcessor:
         """Validate file format"""
         allowed_extensions = ['.pdf', '.docx', '.doc', '.txt']
         file_extension = os.path.splitext(filename)[1].lower()
-        return file_extension in allowed_extensions
\ No newline at end of file
+        return file_extension in allowed_extensions
+    
+    @staticmethod
+    def validate_file_signature(filename: str, header: bytes) -> bool:
+        """Validate that the leading bytes of a file match its extension"""
+        file_extension = os.path.splitext(filename)[1].lower()
+        if file_extension == '.txt':
+            # Plain text heuristic: no NUL bytes and not a known binary format
+            known_signatures = [sig for sigs in FILE_SIGNATURES.values() for sig in sigs]
+            return b'\x00' not in header and not header.startswith(tuple(known_signatures))
+        signatures = FILE_SIGNATURES.get(file_extension)
+        return bool(signatures) and header.startswith(signatures)
\ No newline at end of file
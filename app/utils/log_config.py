@@ -0,0 +1,28 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+_listener = None
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """Configure root logging to write records from a background thread
+    
+    Log calls only enqueue the record; a QueueListener thread formats it and
+    writes to stderr, so slow stdio never blocks the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
\ No newline at end of file
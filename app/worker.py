@@ -0,0 +1,37 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables before the services read them
+load_dotenv()
+
+from arq.connections import RedisSettings
+from app.services.database import init_db
+from app.services.vector_db import initialize_vector_db
+from app.services.gemini_service import load_tokenizer
+from app.services.evaluation_pipeline import get_evaluation_pipeline
+from app.utils.log_config import setup_logging
+import logging
+
+setup_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+async def run_evaluation_task(ctx, task_id: str) -> None:
+    """Run the evaluation pipeline for a queued task"""
+    pipeline = get_evaluation_pipeline()
+    await pipeline.run_evaluation(task_id)
+
+async def startup(ctx):
+    """Initialize database and vector database when the worker starts"""
+    logger.info("Starting up evaluation worker...")
+    await init_db()
+    await initialize_vector_db()
+    await load_tokenizer()
+
+class WorkerSettings:
+    """ARQ worker configuration (run with: arq app.worker.WorkerSettings)"""
+    functions = [run_evaluation_task]
+    on_startup = startup
+    redis_settings = RedisSettings.from_dsn(REDIS_URL)
+    job_timeout = 600
@@ -4,24 +4,38 @@ from dotenv import load_dotenv
 # Load environment variables first
 load_dotenv()
 
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router
+from fastapi.responses import JSONResponse
+from app.api.routes import router, MAX_REQUEST_SIZE
 from app.services.database import init_db
 from app.services.vector_db import initialize_vector_db
+from app.services.gemini_service import load_tokenizer
+from app.utils.log_config import setup_logging
 import logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+setup_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
+REDIS_URL = os.getenv("REDIS_URL")
+
 app = FastAPI(
     title="CV Evaluation Backend",
     description="AI-powered CV and project evaluation system using Gemini API",
     version="1.0.0"
 )
 
-# CORS middleware
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Reject oversized uploads from the Content-Length header before reading the body"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_REQUEST_SIZE:
+        return JSONResponse(status_code=413, content={"detail": "Request too large (max 10MB per file)"})
+    return await call_next(request)
+
+# CORS middleware (added last so it wraps the other middleware and their
+# early responses, such as the 413 above, get CORS headers too)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -39,8 +53,25 @@ async def startup_event():
     logger.info("Starting up CV Evaluation Backend...")
     await init_db()
     await initialize_vector_db()
+    await load_tokenizer()
+    
+    # Use the ARQ worker queue when Redis is configured, otherwise evaluations
+    # run in-process via BackgroundTasks
+    app.state.arq = None
+    if REDIS_URL:
+        from arq import create_pool
+        from arq.connections import RedisSettings
+        app.state.arq = await create_pool(RedisSettings.from_dsn(REDIS_URL))
+        logger.info("Connected to ARQ job queue")
+    
     logger.info("Application startup completed")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the job queue connection on shutdown"""
+    if getattr(app.state, "arq", None) is not None:
+        await app.state.arq.close()
+
 @app.get("/")
 async def root():
     return {"message": "CV Evaluation Backend API", "version": "1.0.0"}
@@ -62,6 +62,35 @@ async def test_gemini_api():
         print(f"✗ Gemini API test failed: {e}")
         return False
 
+async def test_gemini_async_transport():
+    """Test that async Gemini calls run on the asyncio gRPC transport"""
+    print("\nTesting Gemini async transport...")
+    
+    # No request is sent, so a placeholder key is enough when none is configured
+    had_api_key = "GEMINI_API_KEY" in os.environ
+    os.environ.setdefault("GEMINI_API_KEY", "placeholder")
+    try:
+        from google.generativeai.client import get_default_generative_async_client
+        from google.ai.generativelanguage_v1beta.services.generative_service.transports import (
+            GenerativeServiceGrpcAsyncIOTransport
+        )
+        from app.services.gemini_service import GeminiService
+        
+        GeminiService()
+        transport = get_default_generative_async_client().transport
+        if isinstance(transport, GenerativeServiceGrpcAsyncIOTransport):
+            print(f"✓ Async client uses {type(transport).__name__}")
+            return True
+        
+        print(f"✗ Async client uses {type(transport).__name__}, which blocks the event loop")
+        return False
+    except Exception as e:
+        print(f"✗ Gemini async transport test failed: {e}")
+        return False
+    finally:
+        if not had_api_key:
+            os.environ.pop("GEMINI_API_KEY", None)
+
 async def test_document_processing():
     """Test document processing"""
     print("\nTesting document processing...")
@@ -102,6 +131,7 @@ async def main():
     tests = [
         test_imports,
         test_gemini_api,
+        test_gemini_async_transport,
         test_document_processing
     ]
     